@@ -13,17 +13,22 @@ Everything else remains identical.
 """
 
 import os
+import atexit
 import sys
-import json
+import shutil
+import sqlite3
 import hashlib
 import logging
 import threading
+import time
+from functools import lru_cache
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse, ParseResult, quote, unquote
-from io import BytesIO
 
+import orjson
 import requests
 from requests.adapters import HTTPAdapter, Retry
+# Same import for stock Pillow or pillow-simd (AVX2 resize/decode, installed by the workflow)
 from PIL import Image
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
@@ -36,11 +41,18 @@ FOLDERS = [
 
 OUTPUT_BASE = Path("./downloaded-images")
 
+# url hash -> local path of an already converted image (shared across channels and runs)
+CACHE_DB = Path("./img_cache.sqlite3")
+CACHE_MAX_ROWS = 50000  # least recently used rows beyond this are evicted
+
 WP_PREFIX = "https://intvschedule.com/wp-content/uploads/downloaded-images"
 
 TARGET_WIDTH = 250
 MAX_WORKERS = 30
+ENCODE_WORKERS = os.cpu_count() or 1  # concurrent decode/resize/encode, independent of MAX_WORKERS
+FILE_WORKERS = 4  # JSON files processed concurrently (all sharing the MAX_WORKERS download pool)
 REQUEST_TIMEOUT = 20
+URL_CACHE_SIZE = 8192  # memoized URL helpers; show logos repeat across channels
 RETRIES = 3
 BACKOFF_FACTOR = 0.5
 
@@ -59,7 +71,13 @@ def make_session():
         status_forcelist=[429, 500, 502, 503, 504],
         allowed_methods=["HEAD", "GET", "OPTIONS"]
     )
-    adapter = HTTPAdapter(max_retries=retries)
+    # One pooled connection per worker thread so none of them reopen TLS connections
+    adapter = HTTPAdapter(
+        max_retries=retries,
+        pool_connections=MAX_WORKERS,
+        pool_maxsize=MAX_WORKERS,
+        pool_block=False
+    )
     session.mount("https://", adapter)
     session.mount("http://", adapter)
     return session
@@ -67,63 +85,150 @@ def make_session():
 SESSION = make_session()
 SESSION.headers.update({"User-Agent": "dishtv-image-downloader/2.0"})
 
+# One download pool for the whole run, shared by the FILE_WORKERS file threads,
+# so at most MAX_WORKERS downloads are in flight in total; no per-file thread
+# spawn/teardown, and the session's keep-alive connections stay warm across files
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="dl")
+atexit.register(EXECUTOR.shutdown)
+
+# Downloads run MAX_WORKERS-wide; only ENCODE_WORKERS of them do CPU-bound PIL work at once
+ENCODE_SLOTS = threading.BoundedSemaphore(ENCODE_WORKERS)
+
+CACHE = sqlite3.connect(CACHE_DB, check_same_thread=False)
+CACHE.execute("CREATE TABLE IF NOT EXISTS url_cache(url_hash TEXT PRIMARY KEY, path TEXT, last_used REAL)")
+CACHE_LOCK = threading.Lock()
+
+# url hash -> Future of the download currently fetching it, so concurrent files share it
+INFLIGHT = {}
+INFLIGHT_LOCK = threading.Lock()
+
+
+def cache_lookup(url_hash: str):
+    """Return the cached local path for this URL hash if it still exists on disk."""
+    with CACHE_LOCK:
+        row = CACHE.execute("SELECT path FROM url_cache WHERE url_hash=?", (url_hash,)).fetchone()
+        if row is None:
+            return None
+        if not os.path.exists(row[0]):
+            CACHE.execute("DELETE FROM url_cache WHERE url_hash=?", (url_hash,))
+            return None
+        # committed with the next cache_store() / cache_prune()
+        CACHE.execute("UPDATE url_cache SET last_used=? WHERE url_hash=?", (time.time(), url_hash))
+    return Path(row[0])
+
+
+def cache_store(entries):
+    """entries: iterable of (url_hash, path)."""
+    now = time.time()
+    with CACHE_LOCK:
+        CACHE.executemany(
+            "INSERT OR REPLACE INTO url_cache(url_hash, path, last_used) VALUES (?, ?, ?)",
+            [(h, path, now) for h, path in entries]
+        )
+        CACHE.commit()
+
+
+def cache_prune():
+    """Drop rows whose file is gone, then keep only the CACHE_MAX_ROWS most recently used."""
+    with CACHE_LOCK:
+        rows = CACHE.execute("SELECT url_hash, path FROM url_cache").fetchall()
+        stale = [(h,) for h, path in rows if not os.path.exists(path)]
+        CACHE.executemany("DELETE FROM url_cache WHERE url_hash=?", stale)
+        CACHE.execute(
+            "DELETE FROM url_cache WHERE url_hash NOT IN "
+            "(SELECT url_hash FROM url_cache ORDER BY last_used DESC LIMIT ?)",
+            (CACHE_MAX_ROWS,)
+        )
+        CACHE.commit()
+
+
+def link_or_copy(src: Path, dst: Path) -> bool:
+    """Hardlink (falling back to a copy) src to dst. False if src is no longer there."""
+    # Hardlink keeps the per-channel layout WP_PREFIX expects at no extra disk cost
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        pass
+    except OSError:
+        try:
+            shutil.copy2(src, dst)
+        except OSError as e:
+            logger.warning(f"Cannot reuse cached image {src}: {e}")
+            return False
+    return True
+
 
 def slug_from_filename(json_path: Path) -> str:
     return json_path.stem.lower().replace(" ", "-")
 
 
-def parse_and_adjust_size(url: str, target_width: int) -> str:
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def parse_and_adjust_size(url: str, target_width: int = TARGET_WIDTH) -> str:
     """If URL has lock=W×H, adjust it. If not, leave unchanged."""
     try:
         parsed = urlparse(url)
-        qs = parse_qs(parsed.query, keep_blank_values=True)
+    except ValueError:  # e.g. malformed IPv6 netloc
+        return url
+    qs = parse_qs(parsed.query, keep_blank_values=True)
+
+    # NEW LOGIC → If no lock param, leave URL unchanged
+    if "lock" not in qs:
+        return url
+
+    lock_vals = qs["lock"]
+    lock = lock_vals[0]
 
-        # NEW LOGIC → If no lock param, leave URL unchanged
-        if "lock" not in qs:
+    if "x" in lock:
+        parts = lock.split("x")
+        if len(parts) != 2:
             return url
+        try:
+            w = int(parts[0])
+            h = int(parts[1])
+            new_h = max(1, round(h * (target_width / w)))
+            qs["lock"] = [f"{target_width}x{new_h}"]
+        except (ValueError, ZeroDivisionError, OverflowError):  # OverflowError: huge H in float math
+            qs["lock"] = [f"{target_width}x{target_width}"]
+
+    new_query = urlencode(qs, doseq=True)
+
+    new_parsed = ParseResult(
+        scheme=parsed.scheme,
+        netloc=parsed.netloc,
+        path=parsed.path,
+        params=parsed.params,
+        query=new_query,
+        fragment=parsed.fragment
+    )
 
-        lock_vals = qs["lock"]
-        lock = lock_vals[0]
+    return urlunparse(new_parsed)
 
-        if "x" in lock:
-            w, h = lock.split("x")
-            try:
-                w = int(w)
-                h = int(h)
-                new_h = max(1, round(h * (target_width / w)))
-                qs["lock"] = [f"{target_width}x{new_h}"]
-            except:
-                qs["lock"] = [f"{target_width}x{target_width}"]
-
-        new_query = urlencode(qs, doseq=True)
-
-        new_parsed = ParseResult(
-            scheme=parsed.scheme,
-            netloc=parsed.netloc,
-            path=parsed.path,
-            params=parsed.params,
-            query=new_query,
-            fragment=parsed.fragment
-        )
 
-        return urlunparse(new_parsed)
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def url_hash(url: str) -> str:
+    """Full 128-bit non-cryptographic key for a URL; url_cache is keyed on all of it."""
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
 
-    except:
-        return url
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def name_hash(url: str) -> str:
+    """md5 of a URL for output file names; kept so already downloaded images keep matching."""
+    return hashlib.md5(url.encode("utf-8")).hexdigest()
 
 
-def url_basename(url: str) -> str:
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def url_basename(url: str, name_h: str) -> str:
     p = urlparse(url)
     name = os.path.basename(unquote(p.path))
     if not name:
-        name = hashlib.md5(url.encode("utf-8")).hexdigest() + ".img"
+        name = name_h + ".img"
     return name
 
 
-def unique_filename_for(url: str, basename: str) -> str:
+def unique_filename_for(basename: str, name_h: str) -> str:
     base, _ = os.path.splitext(basename)
-    h = hashlib.md5(url.encode("utf-8")).hexdigest()[:10]
-    return f"{base}_{h}.webp".replace(" ", "_")
+    # 10-hex prefix is enough here: the basename is part of the filename too
+    return f"{base}_{name_h[:10]}.webp".replace(" ", "_")
 
 
 def ensure_dir(p: Path):
@@ -138,42 +243,49 @@ def download_and_convert_to_webp(norm_url: str, save_path: Path, session: reques
     tmp = save_path.with_suffix(".part")
 
     try:
-        resp = session.get(norm_url, stream=True, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
-
-        content = BytesIO()
-        for chunk in resp.iter_content(8192):
-            if chunk:
-                content.write(chunk)
-        content.seek(0)
+        with session.get(norm_url, stream=True, timeout=REQUEST_TIMEOUT) as resp:
+            resp.raise_for_status()
+            resp.raw.decode_content = True
 
-        try:
-            img = Image.open(content)
-
-            # ---------------------------
-            # ✔️ NEW LOGIC: Resize if URL has NO lock param
-            # ---------------------------
-            if "lock=" not in norm_url:
-                w, h = img.size
-                new_w = TARGET_WIDTH
-                new_h = int((h / w) * new_w)
-                img = img.resize((new_w, new_h), Image.LANCZOS)
-
-            if img.mode in ("RGBA", "P"):
-                img = img.convert("RGBA")
-            else:
-                img = img.convert("RGB")
-
-            ensure_dir(save_path.parent)
-            img.save(tmp, "WEBP", quality=80, method=6)
-
-            tmp.replace(save_path)
-            return True
-
-        except Exception as e:
-            logger.warning(f"Image convert failed {norm_url}: {e}")
-            tmp.unlink(missing_ok=True)
-            return False
+            try:
+                # PIL buffers the non-seekable raw stream itself; no BytesIO copy on our side
+                img = Image.open(resp.raw)
+
+                with ENCODE_SLOTS:
+                    # ---------------------------
+                    # ✔️ NEW LOGIC: Resize if URL has NO lock param
+                    # ---------------------------
+                    if "lock=" not in norm_url:
+                        w, h = img.size
+                        # Let libjpeg DCT-scale large JPEGs during decode (no-op for other formats);
+                        # keep >= 2x the target so the final resize still has detail to work with.
+                        if w > TARGET_WIDTH * 2:
+                            img.draft("RGB", (TARGET_WIDTH * 2, max(1, h * TARGET_WIDTH * 2 // w)))
+                            w, h = img.size
+                        new_w = TARGET_WIDTH
+                        new_h = int((h / w) * new_w)
+                        img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+
+                    # Only convert when needed (opaque RGB logos are the common case), and
+                    # drop alpha that is fully opaque so WebP doesn't encode an alpha plane.
+                    if img.mode == "P":
+                        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+                    if img.mode == "RGBA":
+                        if img.getextrema()[3][0] == 255:
+                            img = img.convert("RGB")
+                    elif img.mode != "RGB":
+                        img = img.convert("RGB")
+
+                    ensure_dir(save_path.parent)
+                    img.save(tmp, "WEBP", quality=80, method=4)
+
+                tmp.replace(save_path)
+                return True
+
+            except Exception as e:
+                logger.warning(f"Image convert failed {norm_url}: {e}")
+                tmp.unlink(missing_ok=True)
+                return False
 
     except Exception as e:
         logger.warning(f"Download failed {norm_url}: {e}")
@@ -181,12 +293,25 @@ def download_and_convert_to_webp(norm_url: str, save_path: Path, session: reques
         return False
 
 
+def fetch_image(norm_url: str, url_hash: str, save_path: Path, session: requests.Session):
+    """Download one image and record it in CACHE as soon as it lands. Returns its path or None."""
+    try:
+        if download_and_convert_to_webp(norm_url, save_path, session):
+            cache_store([(url_hash, str(save_path))])
+            return save_path
+        return None
+    finally:
+        with INFLIGHT_LOCK:
+            INFLIGHT.pop(url_hash, None)
+
+
 def process_json_file(json_path: Path, session: requests.Session):
 
-    per_file_downloaded = {}  # dedupe inside file only
+    per_file_downloaded = {}  # dedupe inside file
 
     try:
-        data = json.load(open(json_path, "r", encoding="utf-8"))
+        with open(json_path, "rb") as f:
+            data = orjson.loads(f.read())
     except Exception as e:
         logger.error(f"Cannot read JSON {json_path}: {e}")
         return
@@ -210,14 +335,17 @@ def process_json_file(json_path: Path, session: requests.Session):
     orig_to_norm = {}
 
     for idx, url in to_update:
-        norm = parse_and_adjust_size(url, TARGET_WIDTH)
+        norm = parse_and_adjust_size(url)
         orig_to_norm[url] = norm
         norm_entries.setdefault(norm, []).append(idx)
 
-    tasks = []
+    existing = []  # (h, path) already on disk, recorded in CACHE
+    pending = []  # (norm_url, local_path, future)
     for norm_url in norm_entries:
-        basename = url_basename(norm_url)
-        filename = unique_filename_for(norm_url, basename)
+        h = url_hash(norm_url)
+        name_h = name_hash(norm_url)
+        basename = url_basename(norm_url, name_h)
+        filename = unique_filename_for(basename, name_h)
 
         local_dir = OUTPUT_BASE / slug / day
         ensure_dir(local_dir)
@@ -228,22 +356,41 @@ def process_json_file(json_path: Path, session: requests.Session):
 
         if local_path.exists():
             per_file_downloaded[norm_url] = str(local_path)
+            existing.append((h, str(local_path)))
             continue
 
-        tasks.append((norm_url, local_path))
-
-    if tasks:
-        logger.info(f"{json_path.name}: downloading {len(tasks)} images...")
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
-            futures = {
-                ex.submit(download_and_convert_to_webp, url, path, session): (url, path)
-                for url, path in tasks
-            }
-
-            for fut in tqdm(as_completed(futures), total=len(futures), unit="img", desc=f"{json_path.name}"):
-                pass
-
-        for norm_url, local_path in tasks:
+        with INFLIGHT_LOCK:
+            fut = INFLIGHT.get(h)
+        if fut is None:
+            # SQLite query and link/copy stay outside INFLIGHT_LOCK so other files aren't stalled
+            cached = cache_lookup(h)
+            if cached and link_or_copy(cached, local_path):
+                per_file_downloaded[norm_url] = str(local_path)
+                continue
+            with INFLIGHT_LOCK:
+                # another file may have started this download since the first check
+                fut = INFLIGHT.get(h)
+                if fut is None:
+                    fut = EXECUTOR.submit(fetch_image, norm_url, h, local_path, session)
+                    INFLIGHT[h] = fut
+
+        pending.append((norm_url, local_path, fut))
+
+    if existing:
+        cache_store(existing)
+
+    if pending:
+        logger.info(f"{json_path.name}: downloading {len(pending)} images...")
+        futures = {fut for _, _, fut in pending}
+
+        for fut in tqdm(as_completed(futures), total=len(futures), unit="img", desc=f"{json_path.name}"):
+            pass
+
+        for norm_url, local_path, fut in pending:
+            src = fut.result()
+            # Fetched for another channel's file: reuse it here as well
+            if src is not None and src != local_path:
+                link_or_copy(src, local_path)
             if local_path.exists():
                 per_file_downloaded[norm_url] = str(local_path)
             else:
@@ -260,7 +407,9 @@ def process_json_file(json_path: Path, session: requests.Session):
         else:
             logger.warning(f"Failed image for {orig_url}")
 
-    json.dump(data, open(json_path, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+    # orjson writes UTF-8 directly; same output as json.dump(indent=2, ensure_ascii=False)
+    with open(json_path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
     logger.info(f"Updated JSON: {json_path}")
 
 
@@ -275,11 +424,14 @@ def gather_json_files(folders):
 
 
 def main():
+    cache_prune()
     files = gather_json_files(FOLDERS)
     logger.info(f"Processing {len(files)} JSON files...")
 
-    for file in files:
-        process_json_file(file, SESSION)
+    # Overlap one file's encode tail with the next file's downloads
+    with ThreadPoolExecutor(max_workers=FILE_WORKERS) as ex:
+        list(ex.map(lambda f: process_json_file(f, SESSION), files))
+    CACHE.commit()
 
     logger.info("All done.")
 
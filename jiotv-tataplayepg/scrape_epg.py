@@ -8,17 +8,16 @@ and write one JSON per channel for today and tomorrow (IST) into:
 If no schedule is found for a given day => DO NOT save JSON for that day.
 If no schedule found for both days => skip both + log missing.
 
-Requirements: requests
+Requirements: requests, lxml, orjson
 """
 import os
 import gzip
-import io
-import re
-import json
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
+import orjson
 import requests
-import xml.etree.ElementTree as ET
-from typing import Dict, List
+import lxml.etree as ET
+from typing import Dict, Iterator, List, Tuple
 
 # ---------- CONFIG ----------
 BASE_DIR = "jiotv-tataplayepg"
@@ -33,12 +32,38 @@ TATA_URL = "https://avkb.short.gy/tsepg.xml.gz"
 
 IST = timezone(timedelta(hours=5, minutes=30))
 
+# Both EPGs come from the same host; reuse the connection
+SESSION = requests.Session()
+
+_SLUG_KEEP = frozenset("abcdefghijklmnopqrstuvwxyz0123456789-")
+
+
+class _SlugTable(dict):
+    """str.translate table: whitespace -> "-", [a-z0-9-] kept, anything else dropped.
+
+    Filled lazily per code point, so non-ASCII letters are dropped and Unicode whitespace
+    also becomes "-".
+    """
+
+    def __missing__(self, cp):
+        c = chr(cp)
+        if c.isspace():
+            v = ord("-")
+        elif c in _SLUG_KEEP:
+            v = cp
+        else:
+            v = None
+        self[cp] = v
+        return v
+
+
+_SLUG_TABLE = _SlugTable()
+
 
 def slugify(name: str) -> str:
-    name = name.strip().lower()
-    name = re.sub(r"[\s]+", "-", name)
-    name = re.sub(r"[^a-z0-9\-]", "", name)
-    name = re.sub(r"-{2,}", "-", name)
+    name = name.strip().lower().translate(_SLUG_TABLE)
+    while "--" in name:
+        name = name.replace("--", "-")
     name = name.strip("-")
     return name or "channel"
 
@@ -49,80 +74,92 @@ def ensure_dirs():
     os.makedirs(BASE_DIR, exist_ok=True)
 
 
-def download_and_parse_gz_xml(url: str) -> ET.Element:
-    resp = requests.get(url, timeout=60)
-    resp.raise_for_status()
-    data = resp.content
-    with gzip.GzipFile(fileobj=io.BytesIO(data)) as f:
-        xml_bytes = f.read()
-    return ET.fromstring(xml_bytes)
-
-
-def extract_channels(root: ET.Element) -> Dict[str, str]:
+@contextmanager
+def download_gz_xml_stream(url: str) -> Iterator[gzip.GzipFile]:
+    # Closing the GzipFile does not close resp.raw; keep the response in a with block too
+    with SESSION.get(url, stream=True, timeout=60) as resp:
+        resp.raise_for_status()
+        # Undo any transfer Content-Encoding first (resp.content did); GzipFile unpacks the .gz
+        resp.raw.decode_content = True
+        with gzip.GzipFile(fileobj=resp.raw) as f:
+            yield f
+
+
+def parse_dt(s: str):
+    s = s.strip()
+    # isascii() too: isdigit() alone accepts e.g. "²", which int() rejects
+    if len(s) < 14 or not (s[:14].isascii() and s[:14].isdigit()):
+        return None
+    return datetime(int(s[0:4]), int(s[4:6]), int(s[6:8]),
+                    int(s[8:10]), int(s[10:12]), int(s[12:14]), tzinfo=timezone.utc)
+
+
+def channel_name(ch: ET._Element):
+    # tag=ET.Element skips comments / processing instructions
+    for child in ch.iterchildren(tag=ET.Element):
+        t = child.tag.lower()
+        if "display" in t or "name" in t:
+            txt = (child.text or "").strip()
+            if txt:
+                return txt
+    for child in ch.iterchildren(tag=ET.Element):
+        txt = (child.text or "").strip()
+        if txt:
+            return txt
+    return None
+
+
+def programme_entry(prog: ET._Element):
+    ch = prog.get("channel")
+    sdt = parse_dt(prog.get("start", ""))
+    edt = parse_dt(prog.get("stop", ""))
+
+    title = ""
+    icon = ""
+
+    for child in prog.iterchildren(tag=ET.Element):
+        tg = child.tag.lower()
+        if tg.endswith("title") and (child.text and child.text.strip()):
+            title = child.text.strip()
+        if tg.endswith("icon"):
+            icon = child.get("src") or child.get("href") or ""
+
+    if not icon:
+        icon_el = prog.find(".//icon")
+        if icon_el is not None:
+            icon = icon_el.get("src") or icon_el.get("href") or ""
+
+    if ch and sdt and edt:
+        return {
+            "channel_id": ch,
+            # converted once here instead of once per day bucket
+            "start_ist": to_ist(sdt),
+            "stop_ist": to_ist(edt),
+            "title": title,
+            "icon": icon
+        }
+    return None
+
+
+def parse_epg(stream) -> Tuple[Dict[str, str], List[Dict]]:
+    """Single streaming pass over the EPG XML: returns (channel id -> name, programmes)."""
     mapping = {}
-    for ch in root.findall(".//channel"):
-        ch_id = ch.get("id") or ""
-        name = None
-        for child in ch:
-            t = child.tag.lower()
-            if "display" in t or "name" in t:
-                txt = (child.text or "").strip()
-                if txt:
-                    name = txt
-                    break
-        if not name:
-            for child in ch:
-                txt = (child.text or "").strip()
-                if txt:
-                    name = txt
-                    break
-        if ch_id and name:
-            mapping[ch_id] = name
-    return mapping
-
-
-def parse_programmes(root: ET.Element) -> List[Dict]:
     items = []
-    for prog in root.findall(".//programme"):
-        ch = prog.get("channel")
-        start_attr = prog.get("start", "")
-        stop_attr = prog.get("stop", "")
-
-        def parse_dt(s):
-            m = re.match(r"(\d{14})", s.strip())
-            if not m:
-                return None
-            dt = datetime.strptime(m.group(1), "%Y%m%d%H%M%S")
-            return dt.replace(tzinfo=timezone.utc)
-
-        sdt = parse_dt(start_attr)
-        edt = parse_dt(stop_attr)
-
-        title = ""
-        icon = ""
-
-        for child in prog:
-            tg = child.tag.lower()
-            if tg.endswith("title") and (child.text and child.text.strip()):
-                title = child.text.strip()
-            if tg.endswith("icon"):
-                icon = child.get("src") or child.get("href") or ""
-
-        if not icon:
-            icon_el = prog.find(".//icon")
-            if icon_el is not None:
-                icon = icon_el.get("src") or icon_el.get("href") or ""
-
-        if ch and sdt and edt:
-            items.append({
-                "channel_id": ch,
-                "start_utc": sdt,
-                "stop_utc": edt,
-                "title": title,
-                "icon": icon
-            })
-
-    return items
+    for _, elem in ET.iterparse(stream, events=("end",), tag=("channel", "programme")):
+        if elem.tag == "channel":
+            ch_id = elem.get("id") or ""
+            name = channel_name(elem)
+            if ch_id and name:
+                mapping[ch_id] = name
+        else:
+            entry = programme_entry(elem)
+            if entry:
+                items.append(entry)
+        # drop this subtree and the already-processed siblings held by the root
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    return mapping, items
 
 
 def group_by_channel(programmes: List[Dict]) -> Dict[str, List[Dict]]:
@@ -136,28 +173,41 @@ def to_ist(dt):
     return dt.astimezone(IST)
 
 
-def format_date(dt):
-    return dt.strftime("%B %d, %Y")
+_MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+           "August", "September", "October", "November", "December"]
 
 
-def format_time(dt):
-    return dt.strftime("%I:%M %p").lstrip("0") if dt.strftime("%I").startswith("0") else dt.strftime("%I:%M %p")
+def format_date(dt):
+    # "%B %d, %Y" without strftime
+    return f"{_MONTHS[dt.month - 1]} {dt.day:02d}, {dt.year}"
 
 
-def build_schedule_for_day(channel_progs, date):
-    out = []
-    for p in channel_progs:
-        s = to_ist(p["start_utc"])
-        e = to_ist(p["stop_utc"])
-        if s.date() == date:
-            out.append({
-                "show_name": p["title"],
-                "start_time": format_time(s),
-                "end_time": format_time(e),
-                "show_logo": p["icon"]
-            })
-    out.sort(key=lambda x: datetime.strptime(x["start_time"], "%I:%M %p"))
-    return out
+def format_time(dt):
+    # "%I:%M %p" without the leading zero on the hour
+    return f"{dt.hour % 12 or 12}:{dt.minute:02d} {'AM' if dt.hour < 12 else 'PM'}"
+
+
+def build_schedules(channel_progs, today, tomorrow):
+    """Single pass over a channel's programmes -> (today schedule, tomorrow schedule)."""
+    today_out = []
+    tomorrow_out = []
+    # same order as sorting by start time within the day, without reparsing strings
+    for p in sorted(channel_progs, key=lambda p: p["start_ist"]):
+        s = p["start_ist"]
+        d = s.date()
+        if d == today:
+            bucket = today_out
+        elif d == tomorrow:
+            bucket = tomorrow_out
+        else:
+            continue
+        bucket.append({
+            "show_name": p["title"],
+            "start_time": format_time(s),
+            "end_time": format_time(p["stop_ist"]),
+            "show_logo": p["icon"]
+        })
+    return today_out, tomorrow_out
 
 
 def main():
@@ -170,20 +220,17 @@ def main():
     filters = [x.strip() for x in open(FILTER_FILE, "r", encoding="utf-8") if x.strip()]
     filter_map = {f.lower(): f for f in filters}
 
-    print("Downloading EPGs...")
-    jio_root = download_and_parse_gz_xml(JIO_URL)
-    tata_root = download_and_parse_gz_xml(TATA_URL)
-
-    print("Extracting channels...")
-    jio_ch = extract_channels(jio_root)
-    tata_ch = extract_channels(tata_root)
+    print("Downloading and parsing EPGs...")
+    with download_gz_xml_stream(JIO_URL) as f:
+        jio_ch, jio_items = parse_epg(f)
+    with download_gz_xml_stream(TATA_URL) as f:
+        tata_ch, tata_items = parse_epg(f)
 
     jio_map = {v.lower(): k for k, v in jio_ch.items()}
     tata_map = {v.lower(): k for k, v in tata_ch.items()}
 
-    print("Parsing programmes...")
-    jio_prog = group_by_channel(parse_programmes(jio_root))
-    tata_prog = group_by_channel(parse_programmes(tata_root))
+    jio_prog = group_by_channel(jio_items)
+    tata_prog = group_by_channel(tata_items)
 
     today = datetime.now(IST).date()
     tomorrow = today + timedelta(days=1)
@@ -208,8 +255,7 @@ def main():
 
         progs = jio_prog.get(ch_id, []) if source == "jio" else tata_prog.get(ch_id, [])
 
-        sch_today = build_schedule_for_day(progs, today)
-        sch_tomorrow = build_schedule_for_day(progs, tomorrow)
+        sch_today, sch_tomorrow = build_schedules(progs, today, tomorrow)
 
         # NEW FIX: Skip saving if empty for that day
         nothing_today = len(sch_today) == 0
@@ -228,8 +274,8 @@ def main():
                 "date": format_date(datetime.combine(today, datetime.min.time())),
                 "schedule": sch_today
             }
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(payload, f, indent=2, ensure_ascii=False)
+            with open(path, "wb") as f:
+                f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
 
         # Save TOMORROW only if not empty
         if not nothing_tomorrow:
@@ -239,8 +285,8 @@ def main():
                 "date": format_date(datetime.combine(tomorrow, datetime.min.time())),
                 "schedule": sch_tomorrow
             }
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(payload, f, indent=2, ensure_ascii=False)
+            with open(path, "wb") as f:
+                f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
 
     # Write missing log
     with open(MISSING_LOG, "w", encoding="utf-8") as f: